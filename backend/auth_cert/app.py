@@ -1,8 +1,18 @@
 # app.py - Carbon Credits Authentication Service
 from flask import Flask, request, jsonify
 from PyPDF2 import PdfReader
+try:
+    import pypdfium2 as pdfium  # C-backed and much faster than PyPDF2
+except ImportError:
+    pdfium = None
 import re
+try:
+    import re2  # google-re2: linear-time matching, opt-in via CERT_REGEX_ENGINE
+except ImportError:
+    re2 = None
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv, find_dotenv
 import os
 from flask_cors import CORS
@@ -10,8 +20,12 @@ from pymongo import MongoClient
 from datetime import datetime
 import logging
 from werkzeug.utils import secure_filename
-import tempfile
+import io
 import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,8 +41,50 @@ CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
 # Configuration
 CARBONMARK_API_KEY = os.getenv("CARBONMARK_API_KEY")
 CARBONMARK_API_BASE_URL = os.getenv("CARBONMARK_API_BASE_URL", "https://api.carbonmark.com")
+CARBONMARK_PROJECTS_URL = f"{CARBONMARK_API_BASE_URL}/carbonProjects"
+CARBONMARK_PRODUCTS_URL = f"{CARBONMARK_API_BASE_URL}/products"
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "EcoLedger")
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+FILE_HASH_ALGORITHM = 'sha256'  # stored as hash_algo on each credit
+# 're' (default) or 're2'. RE2's \s and \d are ASCII-only, so e.g. a non-breaking
+# space after "Serial Number:" matches under re but not under re2.
+CERT_REGEX_ENGINE = os.getenv("CERT_REGEX_ENGINE", "re")
+
+# Let Werkzeug reject oversized uploads before the body is read (allowing for multipart overhead)
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE + 64 * 1024
+
+# Each request thread (GUNICORN_THREADS per worker) submits 3 Carbonmark lookups. Ones it
+# doesn't need are cancelled if still queued, but one already running finishes in the
+# background (bounded by its timeout), so the pool can briefly hold more than 3 per request.
+CARBONMARK_MAX_CONNECTIONS = 3 * int(os.getenv("GUNICORN_THREADS", 8))
+
+# Shared HTTP session so Carbonmark calls reuse pooled keep-alive connections
+carbonmark_session = requests.Session()
+if CARBONMARK_API_KEY:
+    carbonmark_session.headers.update({'Authorization': f'Bearer {CARBONMARK_API_KEY}'})
+carbonmark_session.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=CARBONMARK_MAX_CONNECTIONS,
+    max_retries=Retry(
+        total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+        # Hand the last 5xx back instead of raising, so the other lookups still decide;
+        # never sleep on Retry-After, so each lookup stays bounded by its timeout and retries
+        raise_on_status=False, respect_retry_after_header=False,
+    )
+))
+# Worker threads for issuing the Carbonmark lookups in parallel
+carbonmark_pool = ThreadPoolExecutor(max_workers=CARBONMARK_MAX_CONNECTIONS)
+
+# Successful Carbonmark verifications, keyed by normalized project ID
+CARBONMARK_CACHE_TTL = 3600  # seconds
+CARBONMARK_CACHE_MAXSIZE = 4096
+_carbonmark_cache = {}
+_carbonmark_cache_lock = threading.Lock()
+
+# The Carbonmark product (bundle) catalog changes rarely; refresh it at most this often
+CARBONMARK_PRODUCTS_TTL = 300  # seconds
+_bundle_index_cache = (0.0, None)  # (expires_at, {project_id: product})
 
 # MongoDB setup
 try:
@@ -40,6 +96,19 @@ except Exception as e:
     logger.error(f"❌ MongoDB connection failed: {e}")
     raise
 
+# Indexes for the duplicate checks done on every upload
+try:
+    db.credits.create_index('file_hash')
+    db.credits.create_index('extracted_data.serial_number')
+except Exception as e:
+    logger.warning(f"Could not create credits indexes: {e}")
+
+# PDFium is not thread-safe, even across documents; one extraction at a time per process
+_PDFIUM_LOCK = threading.Lock()
+
+# Certificate fields appear near the top; stop extracting pages past this much text
+MAX_PDF_TEXT_CHARS = 32 * 1024
+
 # Regex patterns for PDF text extraction
 PATTERNS = {
     'serial_number': r"[Ss]erial [Nn]umber:\s*([A-Za-z0-9\-]+)",
@@ -52,18 +121,59 @@ PATTERNS = {
     'category': r"[Cc]ategory:\s*([A-Za-z\s\(\)\+\-]+)",
     'issued_to': r"[Ii]ssued [Tt]o:\s*(.+)",
 }
+# Searched one pattern at a time: each starts with a literal label, which lets
+# the regex engine skip ahead quickly. A fused alternation loses that and is slower.
+if CERT_REGEX_ENGINE == 're2' and re2 is None:
+    logger.warning("CERT_REGEX_ENGINE=re2 but google-re2 is not installed - using re")
+_regex_engine = re2 if CERT_REGEX_ENGINE == 're2' and re2 is not None else re
+_PATTERN_SEARCHES = [(key, _regex_engine.compile(pattern).search) for key, pattern in PATTERNS.items()]
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file with error handling."""
-    try:
-        logger.info(f"Extracting text from PDF: {pdf_path}")
-        reader = PdfReader(pdf_path)
-        text = ''.join(page.extract_text() or "" for page in reader.pages)
-        logger.info(f"Successfully extracted {len(text)} characters from PDF")
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {e}")
-        return None
+def iter_pdf_page_texts(pdf_data, use_pdfium=True):
+    """Yield the text of each page of an in-memory PDF in order."""
+    if use_pdfium and pdfium is not None:
+        # Held across yields because the document stays open until the caller stops
+        # iterating; callers must close() the generator so the lock is released promptly
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_data)
+            try:
+                for page in pdf:
+                    yield page.get_textpage().get_text_range()
+            finally:
+                pdf.close()
+    else:
+        for page in PdfReader(io.BytesIO(pdf_data)).pages:
+            yield page.extract_text() or ""
+
+def collect_pdf_text(pdf_data, use_pdfium=True):
+    """Join page texts until every field has matched or MAX_PDF_TEXT_CHARS are collected."""
+    parts = []
+    total_chars = 0
+    pending = _PATTERN_SEARCHES
+    # closing() releases _PDFIUM_LOCK on break or error instead of waiting for GC
+    with closing(iter_pdf_page_texts(pdf_data, use_pdfium)) as page_texts:
+        for page_text in page_texts:
+            parts.append(page_text)
+            total_chars += len(page_text)
+            pending = [(key, search) for key, search in pending if not search(page_text)]
+            if not pending:
+                logger.info("All fields found after %s pages", len(parts))
+                break
+            if total_chars >= MAX_PDF_TEXT_CHARS:
+                logger.info("Stopped extraction after %s pages (%s characters)", len(parts), total_chars)
+                break
+    return ''.join(parts)
+
+def extract_text_from_pdf(pdf_data):
+    """Extract text from PDF bytes, falling back to PyPDF2 if pypdfium2 fails."""
+    logger.info("Extracting text from PDF (%s bytes)", len(pdf_data))
+    for use_pdfium in ((True, False) if pdfium is not None else (False,)):
+        try:
+            text = collect_pdf_text(pdf_data, use_pdfium)
+            logger.info("Successfully extracted %s characters from PDF", len(text))
+            return text
+        except Exception as e:
+            logger.error("Error extracting text from PDF with %s: %s", 'pypdfium2' if use_pdfium else 'PyPDF2', e)
+    return None
 
 def parse_certificate_data(text):
     """Parse extracted text to find certificate details."""
@@ -72,8 +182,8 @@ def parse_certificate_data(text):
         logger.warning("No text provided to parse_certificate_data")
         return extracted_data
 
-    for key, pattern in PATTERNS.items():
-        match = re.search(pattern, text)
+    for key, search in _PATTERN_SEARCHES:
+        match = search(text)
         if match:
             value = match.group(1).strip()
             if key == 'amount':
@@ -81,38 +191,77 @@ def parse_certificate_data(text):
                 try:
                     value = float(value)
                 except ValueError:
-                    logger.warning(f"Could not convert amount '{value}' to float")
+                    logger.warning("Could not convert amount '%s' to float", value)
             extracted_data[key] = value
         else:
-            logger.debug(f"No match found for pattern: {key}")
+            logger.debug("No match found for pattern: %s", key)
             extracted_data[key] = None
     
-    logger.info(f"Extracted data: {extracted_data}")
+    logger.debug("Extracted data: %s", extracted_data)
     return extracted_data
 
+def fetch_carbonmark_bundle_index():
+    """Map upper-cased project IDs to their Carbonmark bundle, cached for CARBONMARK_PRODUCTS_TTL."""
+    global _bundle_index_cache
+    now = time.monotonic()
+    expires_at, bundle_index = _bundle_index_cache
+    if bundle_index is not None and expires_at > now:
+        return bundle_index
+
+    logger.debug("Fetching products: %s", CARBONMARK_PRODUCTS_URL)
+    products_resp = carbonmark_session.get(CARBONMARK_PRODUCTS_URL, timeout=10)
+    products_resp.raise_for_status()
+
+    products_data = products_resp.json()
+    products = products_data['items'] if isinstance(products_data, dict) else products_data
+
+    bundle_index = {}
+    for product in products:
+        for pid in product.get("projectIds", []):
+            # First bundle listing a project wins, as with the old linear scan
+            bundle_index.setdefault(str(pid).upper(), product)
+    _bundle_index_cache = (now + CARBONMARK_PRODUCTS_TTL, bundle_index)
+    return bundle_index
+
 def verify_with_carbonmark(project_id):
     """Verify project with Carbonmark API with robust error handling."""
     if not CARBONMARK_API_KEY:
         logger.error("CARBONMARK_API_KEY not set")
         return {'verified': False, 'message': 'Carbonmark API key missing', 'details': None}
 
-    headers = {'Authorization': f'Bearer {CARBONMARK_API_KEY}'}
     normalized_id = project_id.strip().upper()
-    logger.info(f"Verifying project ID: {normalized_id}")
+    logger.info("Verifying project ID: %s", normalized_id)
+
+    direct_url = f"{CARBONMARK_PROJECTS_URL}/{normalized_id}"
 
+    # The three lookups are independent, so fire them together and
+    # check the results in priority order below.
+    search_future = carbonmark_pool.submit(
+        carbonmark_session.get, CARBONMARK_PROJECTS_URL, params={'search': normalized_id}, timeout=10)
+    direct_future = carbonmark_pool.submit(carbonmark_session.get, direct_url, timeout=10)
+    bundles_future = carbonmark_pool.submit(fetch_carbonmark_bundle_index)
+
+    # Each lookup that raises is logged and treated as a miss, so one failing
+    # endpoint can't hide a match from the others; errors are reported only
+    # when all three failed.
+    errors = []
     try:
         # Step 1: Try search endpoint
-        search_url = f"{CARBONMARK_API_BASE_URL}/carbonProjects"
-        logger.debug(f"Searching Carbonmark API: {search_url}")
-        search_resp = requests.get(search_url, headers=headers, params={'search': normalized_id}, timeout=10)
-        search_resp.raise_for_status()
-        
-        search_data = search_resp.json()
-        projects = search_data['items'] if isinstance(search_data, dict) else search_data
-        
+        logger.debug("Searching Carbonmark API: %s", CARBONMARK_PROJECTS_URL)
+        try:
+            search_resp = search_future.result()
+            search_resp.raise_for_status()
+            search_data = search_resp.json()
+            projects = search_data['items'] if isinstance(search_data, dict) else search_data
+        except requests.exceptions.RequestException as e:
+            logger.warning("Carbonmark search failed: %s", e)
+            errors.append(e)
+            projects = []
+
         for p in projects:
-            if p.get('key', '').upper() == normalized_id or p.get('projectID', '').upper() == normalized_id:
-                logger.info(f"Project found via search: {normalized_id}")
+            # Fields may be present but null; treat those as non-matching
+            if (p.get('key') or '').upper() == normalized_id or (p.get('projectID') or '').upper() == normalized_id:
+                logger.info("Project found via search: %s", normalized_id)
                 return {
                     'verified': True,
                     'message': 'Found via search',
@@ -125,12 +274,19 @@ def verify_with_carbonmark(project_id):
                 }
 
         # Step 2: Try direct lookup
-        direct_url = f"{CARBONMARK_API_BASE_URL}/carbonProjects/{normalized_id}"
-        logger.debug(f"Attempting direct lookup: {direct_url}")
-        direct_resp = requests.get(direct_url, headers=headers, timeout=10)
-        if direct_resp.status_code == 200:
-            p = direct_resp.json()
-            logger.info(f"Project found via direct lookup: {normalized_id}")
+        logger.debug("Attempting direct lookup: %s", direct_url)
+        p = None
+        try:
+            direct_resp = direct_future.result()
+            if direct_resp.status_code >= 500:
+                direct_resp.raise_for_status()
+            if direct_resp.status_code == 200:
+                p = direct_resp.json()
+        except requests.exceptions.RequestException as e:
+            logger.warning("Carbonmark direct lookup failed: %s", e)
+            errors.append(e)
+        if p is not None:
+            logger.info("Project found via direct lookup: %s", normalized_id)
             return {
                 'verified': True,
                 'message': 'Found via direct lookup',
@@ -143,65 +299,124 @@ def verify_with_carbonmark(project_id):
             }
 
         # Step 3: Check products/bundles
-        products_url = f"{CARBONMARK_API_BASE_URL}/products"
-        logger.debug(f"Checking products: {products_url}")
-        products_resp = requests.get(products_url, headers=headers, timeout=10)
-        products_resp.raise_for_status()
-        
-        products_data = products_resp.json()
-        products = products_data['items'] if isinstance(products_data, dict) else products_data
-        
-        for product in products:
-            if normalized_id in [str(pid).upper() for pid in product.get("projectIds", [])]:
-                logger.info(f"Project found in bundle: {product.get('name')}")
-                return {
-                    'verified': True,
-                    'message': f"Found in bundle: {product.get('name')}",
-                    'details': {
-                        'id': normalized_id,
-                        'name': product.get('name'),
-                        'type': "bundle",
-                        'description': product.get('short_description')
-                    }
+        try:
+            product = bundles_future.result().get(normalized_id)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Carbonmark products lookup failed: %s", e)
+            errors.append(e)
+            product = None
+        if product is not None:
+            logger.info("Project found in bundle: %s", product.get('name'))
+            return {
+                'verified': True,
+                'message': f"Found in bundle: {product.get('name')}",
+                'details': {
+                    'id': normalized_id,
+                    'name': product.get('name'),
+                    'type': "bundle",
+                    'description': product.get('short_description')
                 }
+            }
 
-        logger.warning(f"Project not found in Carbonmark: {normalized_id}")
+        if len(errors) == 3:
+            logger.error("Carbonmark API error: %s", errors[-1])
+            return {
+                'verified': False,
+                'message': f'Carbonmark API error: {str(errors[-1])}',
+                'details': None
+            }
+
+        logger.warning("Project not found in Carbonmark: %s", normalized_id)
         return {
             'verified': False,
             'message': 'Project not found in Carbonmark',
             'details': None
         }
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Carbonmark API error: {e}")
-        return {
-            'verified': False,
-            'message': f'Carbonmark API error: {str(e)}',
-            'details': None
-        }
+    finally:
+        # Don't leave lookups we returned without queued on the shared pool
+        for future in (search_future, direct_future, bundles_future):
+            future.cancel()
+
+def verify_with_carbonmark_cached(project_id):
+    """Verify project with Carbonmark, reusing recent successful results."""
+    normalized_id = project_id.strip().upper()
+    now = time.monotonic()
+    with _carbonmark_cache_lock:
+        cached = _carbonmark_cache.get(normalized_id)
+    if cached and cached[0] > now:
+        logger.info("Using cached Carbonmark result for: %s", normalized_id)
+        return cached[1]
+
+    result = verify_with_carbonmark(project_id)
+    # Only positives are cached so API errors and new projects are retried
+    if result.get('verified'):
+        with _carbonmark_cache_lock:
+            _carbonmark_cache.pop(normalized_id, None)
+            if len(_carbonmark_cache) >= CARBONMARK_CACHE_MAXSIZE:
+                _carbonmark_cache.pop(next(iter(_carbonmark_cache)))
+            _carbonmark_cache[normalized_id] = (now + CARBONMARK_CACHE_TTL, result)
+    return result
+
+def calculate_file_hash(data):
+    """Calculate the FILE_HASH_ALGORITHM digest of file contents."""
+    return hashlib.new(FILE_HASH_ALGORITHM, data).hexdigest()
 
-def calculate_file_hash(file_path):
-    """Calculate SHA-256 hash of a file."""
-    sha256 = hashlib.sha256()
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(4096):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+def error_response(status, message, code=400, **extra):
+    """Build a failed authentication response; extra keys override the defaults."""
+    return jsonify({
+        'success': False,
+        'status': status,
+        'message': message,
+        'authenticated': False,
+        'extracted_data': None,
+        'carbonmark_details': None,
+        **extra
+    }), code
+
+# Fields of a stored credit that duplicate_response needs
+DUPLICATE_PROJECTION = {'_id': 0, 'status': 1, 'extracted_data': 1, 'carbonmark_details': 1}
+
+def duplicate_response(existing, file_hash):
+    """Build the response for a certificate that is already in the ledger."""
+    extracted_data = existing.get('extracted_data') or {}
+    return jsonify({
+        'success': True,
+        'status': 'duplicate',
+        'message': 'This certificate has already been processed',
+        'authenticated': existing.get('status') == 'authenticated',
+        'extracted_data': existing.get('extracted_data'),
+        'carbonmark_details': existing.get('carbonmark_details'),
+        'serial_number': extracted_data.get('serial_number'),
+        'file_hash': file_hash
+    }), 200
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Return oversized uploads in the same shape as other authentication errors."""
+    logger.warning("Rejected request of %s bytes", request.content_length)
+    return error_response('file_too_large', f'Certificate exceeds the {MAX_FILE_SIZE // (1024 * 1024)} MB limit', 413)
+
+# Health probes within this many seconds share one MongoDB ping
+DB_PING_INTERVAL = 1.0
+_last_db_ping = {'checked_at': 0.0, 'status': 'disconnected'}
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    db_status = 'disconnected'
-    try:
-        client.admin.command('ping')
-        db_status = 'connected'
-    except Exception:
-        db_status = 'disconnected'
+    now = time.monotonic()
+    if now - _last_db_ping['checked_at'] > DB_PING_INTERVAL:
+        try:
+            client.admin.command('ping')
+            db_status = 'connected'
+        except Exception:
+            db_status = 'disconnected'
+        _last_db_ping.update(checked_at=now, status=db_status)
 
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'database': db_status,
+        'database': _last_db_ping['status'],
         'carbonmark_api': bool(CARBONMARK_API_KEY)
     }), 200
 
@@ -210,51 +425,35 @@ def authenticate_certificate():
     """Complete authentication endpoint"""
     if 'certificate' not in request.files:
         logger.warning("No certificate file uploaded")
-        return jsonify({
-            'success': False,
-            'status': 'no_file',
-            'message': 'No certificate uploaded',
-            'authenticated': False,
-            'extracted_data': None,
-            'carbonmark_details': None
-        }), 400
+        return error_response('no_file', 'No certificate uploaded')
 
     certificate_file = request.files['certificate']
     if certificate_file.filename == '':
         logger.warning("Empty certificate filename")
-        return jsonify({
-            'success': False,
-            'status': 'empty_file',
-            'message': 'Empty filename',
-            'authenticated': False,
-            'extracted_data': None,
-            'carbonmark_details': None
-        }), 400
-
-    temp_path = None
+        return error_response('empty_file', 'Empty filename')
+
     try:
-        # Create temp file
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            certificate_file.save(temp_file.name)
-            temp_path = temp_file.name
-            logger.debug(f"Saved temporary file: {temp_path}")
+        # Read the upload into memory; one extra byte tells us it is over the limit
+        pdf_data = certificate_file.read(MAX_FILE_SIZE + 1)
+        if len(pdf_data) > MAX_FILE_SIZE:
+            logger.warning("Certificate exceeds %s bytes", MAX_FILE_SIZE)
+            return error_response('file_too_large', f'Certificate exceeds the {MAX_FILE_SIZE // (1024 * 1024)} MB limit', 413)
 
         # Calculate file hash
-        file_hash = calculate_file_hash(temp_path)
-        logger.debug(f"File hash calculated: {file_hash}")
-        
+        file_hash = calculate_file_hash(pdf_data)
+        logger.debug("File hash calculated: %s", file_hash)
+
+        # Skip PDF parsing entirely for files we have already processed
+        existing = db.credits.find_one({'file_hash': file_hash}, DUPLICATE_PROJECTION)
+        if existing:
+            logger.info("Duplicate found for file hash: %s", file_hash)
+            return duplicate_response(existing, file_hash)
+
         # Extract text from PDF
-        pdf_text = extract_text_from_pdf(temp_path)
+        pdf_text = extract_text_from_pdf(pdf_data)
         if not pdf_text:
             logger.error("Could not extract text from PDF")
-            return jsonify({
-                'success': False,
-                'status': 'extraction_failed',
-                'message': 'Could not extract text from PDF',
-                'authenticated': False,
-                'extracted_data': None,
-                'carbonmark_details': None
-            }), 400
+            return error_response('extraction_failed', 'Could not extract text from PDF')
 
         # Parse certificate data
         extracted_data = parse_certificate_data(pdf_text)
@@ -264,58 +463,48 @@ def authenticate_certificate():
         missing_fields = [f for f in required_fields if not extracted_data.get(f)]
         
         if missing_fields:
-            logger.warning(f"Missing required fields: {missing_fields}")
-            return jsonify({
-                'success': False,
-                'status': 'missing_fields',
-                'message': f'Missing required fields: {", ".join(missing_fields)}',
-                'missing_fields': missing_fields,
-                'extracted_data': extracted_data,
-                'carbonmark_details': None,
-                'authenticated': False
-            }), 400
-
-        # Check for duplicate
+            logger.warning("Missing required fields: %s", missing_fields)
+            return error_response(
+                'missing_fields',
+                f'Missing required fields: {", ".join(missing_fields)}',
+                missing_fields=missing_fields,
+                extracted_data=extracted_data
+            )
+
+        # Check for duplicate by serial number (same certificate, different file)
         serial_number = extracted_data['serial_number']
-        existing = db.credits.find_one({'extracted_data.serial_number': serial_number})
+        existing = db.credits.find_one({'extracted_data.serial_number': serial_number}, DUPLICATE_PROJECTION)
         if existing:
-            logger.info(f"Duplicate found for serial number: {serial_number}")
-            return jsonify({
-                'success': True,
-                'status': 'duplicate',
-                'message': 'This certificate has already been processed',
-                'authenticated': existing.get('status') == 'authenticated',
-                'extracted_data': existing.get('extracted_data'),
-                'carbonmark_details': existing.get('carbonmark_details'),
-                'serial_number': serial_number,
-                'file_hash': file_hash
-            }), 200
+            logger.info("Duplicate found for serial number: %s", serial_number)
+            return duplicate_response(existing, file_hash)
 
         # Carbonmark verification
         carbonmark_result = {'verified': False, 'message': 'Skipped verification', 'details': None}
         if extracted_data.get('project_id'):
-            logger.debug(f"Verifying with Carbonmark: {extracted_data['project_id']}")
-            carbonmark_result = verify_with_carbonmark(extracted_data['project_id'])
-            logger.info(f"Carbonmark result: {carbonmark_result}")
+            logger.debug("Verifying with Carbonmark: %s", extracted_data['project_id'])
+            carbonmark_result = verify_with_carbonmark_cached(extracted_data['project_id'])
+            logger.debug("Carbonmark result: %s", carbonmark_result)
 
         # Determine authentication status
         authenticated = not missing_fields and carbonmark_result.get('verified', False)
         
         # Create credit record
+        safe_name = secure_filename(certificate_file.filename)
         credit_doc = {
             'serialNumber': serial_number,
             'file_hash': file_hash,
+            'hash_algo': FILE_HASH_ALGORITHM,
             'authenticated': authenticated,
             'status': 'authenticated' if authenticated else 'unauthenticated',
             'extracted_data': extracted_data,
             'carbonmark_details': carbonmark_result.get('details'),
             'processing_date': datetime.utcnow(),
-            'original_filename': secure_filename(certificate_file.filename)
+            'original_filename': safe_name
         }
         
         # Insert into MongoDB
         db.credits.insert_one(credit_doc)
-        logger.info(f"Inserted new credit document for serial number: {serial_number}")
+        logger.info("Inserted new credit document for serial number: %s", serial_number)
 
         # Prepare response
         response = {
@@ -327,7 +516,7 @@ def authenticate_certificate():
             'carbonmark_details': carbonmark_result.get('details'),
             'blockchain_status': 'Verified on private Fabric chain',
             'fabric_tx_id': f"tx_{os.urandom(8).hex()}",
-            'original_filename': secure_filename(certificate_file.filename),
+            'original_filename': safe_name,
             'serial_number': serial_number,
             'file_hash': file_hash
         }
@@ -335,24 +524,12 @@ def authenticate_certificate():
         return jsonify(response), 200
 
     except Exception as e:
-        logger.error(f"Authentication error: {str(e)}", exc_info=True)
-        return jsonify({
-            'success': False,
-            'status': 'error',
-            'message': f'An error occurred during authentication: {str(e)}',
-            'authenticated': False,
-            'extracted_data': None,
-            'carbonmark_details': None
-        }), 500
-    finally:
-        if temp_path:
-            try:
-                os.unlink(temp_path)
-                logger.debug(f"Deleted temporary file: {temp_path}")
-            except Exception as e:
-                logger.warning(f"Error deleting temp file: {e}")
+        logger.error("Authentication error: %s", e, exc_info=True)
+        return error_response('error', f'An error occurred during authentication: {str(e)}', 500)
 
 if __name__ == "__main__":
     if not CARBONMARK_API_KEY:
         logger.warning("CARBONMARK_API_KEY not set - Carbonmark verification will fail")
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.getenv("FLASK_ENV") == "development", host='0.0.0.0',
+            port=int(os.getenv("FLASK_PORT", 5001)))
\ No newline at end of file
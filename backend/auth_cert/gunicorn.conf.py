@@ -0,0 +1,12 @@
+# gunicorn.conf.py - Production server settings for the authentication service
+# Run from backend/auth_cert with: gunicorn app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('FLASK_PORT', '5001')}"
+
+# Threaded workers so uploads waiting on Carbonmark or MongoDB don't block each other.
+# PDFium extraction is serialized within a worker (it is not thread-safe), so
+# parallel PDF parsing comes from the number of worker processes, not threads.
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))  # app.py sizes its Carbonmark pools from this too
@@ -30,6 +30,25 @@ let client, db, gfsBucket;
     console.error('❌ MongoDB connection error:', err);
     process.exit(1);
   }
+
+  // Indexes for the queries below (idempotent, safe on every boot)
+  try {
+    await Promise.all([
+      db.collection('users').createIndex({ email: 1 }),
+      db.collection('credits').createIndex({ serialNumber: 1 }),
+      db.collection('credits').createIndex({ userId: 1, uploadedAt: -1 }),
+      db.collection('marketplace_listings').createIndex({ status: 1, createdAt: -1 }),
+      // Public listings filtered by category only ever look at active listings
+      db.collection('marketplace_listings').createIndex(
+        { category: 1, createdAt: -1 },
+        { partialFilterExpression: { status: 'active' } }
+      ),
+      db.collection('marketplace_listings').createIndex({ sellerId: 1, createdAt: -1 }),
+      db.collection('marketplace_listings').createIndex({ creditId: 1, status: 1 })
+    ]);
+  } catch (err) {
+    console.error('Index creation failed (non-critical):', err);
+  }
 })();
 
 // Middleware
@@ -50,16 +69,10 @@ const validateUser = async (req, res, next) => {
   const user = await db.collection('users').findOne({ email });
   if (!user) return res.status(404).json({ success: false, error: 'user_not_found' });
 
-  // Add this debug log
-  console.log('Comparing:', email, 'with admin list:', ADMIN_EMAILS);
-  
   // Case-sensitive comparison (change to .toLowerCase() if needed)
   req.isAdmin = ADMIN_EMAILS.includes(email);
   req.user = user;
   
-  // Debug log
-  console.log('Is admin?', req.isAdmin);
-  
   next();
 };
 
@@ -305,6 +318,15 @@ app.post('/api/marketplace/list', validateUser, async (req, res) => {
       });
     }
 
+    // Reject malformed IDs before they reach MongoDB
+    if (!ObjectId.isValid(creditId)) {
+      return res.status(400).json({ 
+        success: false, 
+        error: 'invalid_credit_id',
+        message: 'Credit ID is not valid'
+      });
+    }
+
     // Check if credit exists and belongs to the user
     const credit = await db.collection('credits').findOne({ 
       _id: new ObjectId(creditId),
@@ -334,6 +356,7 @@ app.post('/api/marketplace/list', validateUser, async (req, res) => {
     }
 
     // Create marketplace listing
+    const now = new Date();
     const listing = {
       creditId: new ObjectId(creditId),
       sellerId: req.user._id,
@@ -350,8 +373,8 @@ app.post('/api/marketplace/list', validateUser, async (req, res) => {
       totalValue: parseFloat(pricePerCredit) * parseFloat(credit.amount),
       description: description || `Verified carbon credits from ${credit.projectName}`,
       status: 'active',
-      createdAt: new Date(),
-      updatedAt: new Date()
+      createdAt: now,
+      updatedAt: now
     };
 
     const result = await db.collection('marketplace_listings').insertOne(listing);
@@ -362,7 +385,7 @@ app.post('/api/marketplace/list', validateUser, async (req, res) => {
       { 
         $set: { 
           status: 'listed',
-          listedAt: new Date(),
+          listedAt: now,
           listingId: result.insertedId
         }
       }
@@ -407,39 +430,48 @@ app.get('/api/marketplace/listings', async (req, res) => {
       if (maxPrice) filter.pricePerCredit.$lte = parseFloat(maxPrice);
     }
 
-    const skip = (parseInt(page) - 1) * parseInt(limit);
+    // $skip/$limit reject NaN, zero and negatives, so fall back to sane values
+    const pageNum = Math.max(1, parseInt(page) || 1);
+    const limitNum = Math.max(1, parseInt(limit) || 20);
+    const skip = (pageNum - 1) * limitNum;
     
-    const listings = await db.collection('marketplace_listings')
-      .find(filter)
-      .sort({ createdAt: -1 })
-      .skip(skip)
-      .limit(parseInt(limit))
-      .toArray();
-
-    const total = await db.collection('marketplace_listings').countDocuments(filter);
+    // Shape the page server-side so only the public fields cross the wire
+    const [listings, total] = await Promise.all([
+      db.collection('marketplace_listings').aggregate([
+        { $match: filter },
+        { $sort: { createdAt: -1 } },
+        { $skip: skip },
+        { $limit: limitNum },
+        {
+          $project: {
+            _id: 0,
+            id: '$_id',
+            serialNumber: 1,
+            projectId: 1,
+            projectName: 1,
+            vintage: 1,
+            amount: 1,
+            registry: 1,
+            category: 1,
+            pricePerCredit: 1,
+            totalValue: 1,
+            description: 1,
+            sellerName: 1,
+            createdAt: 1
+          }
+        }
+      ]).toArray(),
+      db.collection('marketplace_listings').countDocuments(filter)
+    ]);
 
     res.json({
       success: true,
-      listings: listings.map(listing => ({
-        id: listing._id,
-        serialNumber: listing.serialNumber,
-        projectId: listing.projectId,
-        projectName: listing.projectName,
-        vintage: listing.vintage,
-        amount: listing.amount,
-        registry: listing.registry,
-        category: listing.category,
-        pricePerCredit: listing.pricePerCredit,
-        totalValue: listing.totalValue,
-        description: listing.description,
-        sellerName: listing.sellerName,
-        createdAt: listing.createdAt
-      })),
+      listings,
       pagination: {
-        page: parseInt(page),
-        limit: parseInt(limit),
+        page: pageNum,
+        limit: limitNum,
         total,
-        pages: Math.ceil(total / parseInt(limit))
+        pages: Math.ceil(total / limitNum)
       }
     });
 
@@ -458,6 +490,18 @@ app.get('/api/marketplace/my-listings', validateUser, async (req, res) => {
   try {
     const listings = await db.collection('marketplace_listings')
       .find({ sellerId: req.user._id })
+      .project({
+        serialNumber: 1,
+        projectId: 1,
+        projectName: 1,
+        vintage: 1,
+        amount: 1,
+        pricePerCredit: 1,
+        totalValue: 1,
+        description: 1,
+        status: 1,
+        createdAt: 1
+      })
       .sort({ createdAt: -1 })
       .toArray();
 
@@ -493,30 +537,37 @@ app.delete('/api/marketplace/listings/:listingId', validateUser, async (req, res
   try {
     const { listingId } = req.params;
 
-    const listing = await db.collection('marketplace_listings').findOne({
-      _id: new ObjectId(listingId),
-      sellerId: req.user._id
-    });
-
-    if (!listing) {
-      return res.status(404).json({ 
+    if (!ObjectId.isValid(listingId)) {
+      return res.status(400).json({ 
         success: false, 
-        error: 'listing_not_found',
-        message: 'Listing not found or does not belong to you'
+        error: 'invalid_listing_id',
+        message: 'Listing ID is not valid'
       });
     }
 
-    // Update listing status to 'removed'
-    await db.collection('marketplace_listings').updateOne(
-      { _id: new ObjectId(listingId) },
+    // Mark the seller's listing as 'removed' in the same round trip that finds it
+    const listing = await db.collection('marketplace_listings').findOneAndUpdate(
+      {
+        _id: new ObjectId(listingId),
+        sellerId: req.user._id
+      },
       { 
         $set: { 
           status: 'removed',
           removedAt: new Date()
         }
-      }
+      },
+      { projection: { creditId: 1 } }
     );
 
+    if (!listing) {
+      return res.status(404).json({ 
+        success: false, 
+        error: 'listing_not_found',
+        message: 'Listing not found or does not belong to you'
+      });
+    }
+
     // Update credit status back to 'authenticated'
     await db.collection('credits').updateOne(
       { _id: listing.creditId },
@@ -574,6 +625,10 @@ app.get('/api/users/me/credits', validateUser, async (req, res) => {
 app.post('/api/blockchain/mint', validateUser, async (req, res) => {
   try {
     const { creditId } = req.body;
+
+    if (!ObjectId.isValid(creditId)) {
+      return res.status(400).json({ success: false, error: 'invalid_credit_id' });
+    }
     
     // Validate credit exists and belongs to user
     const credit = await db.collection('credits').findOne({ 
@@ -676,8 +731,6 @@ app.post('/api/enroll/user', validateUser, async (req, res) => {
 
 // Check if user is admin
 app.get('/api/admin/check', validateUser, async (req, res) => {
-  console.log('Checking admin access for:', req.user.email);
-  console.log('Admin emails:', ADMIN_EMAILS);
   res.json({ 
     success: true,
     isAdmin: req.isAdmin,